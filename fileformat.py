@@ -2,8 +2,85 @@
 A tool to read and write binary files conveniently.
 """
 
+import functools
+import io
+import mmap
+import operator
+import os
 import struct
-from typing import Any, List, Optional, Tuple, Union, Literal
+import threading
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Final, List, Optional, Tuple, Union, Literal
+
+if TYPE_CHECKING:
+    import numpy
+
+_READ_CHUNK: Final = 64 * 1024
+
+_FLUSH_THRESHOLD: Final = 1024 * 1024
+
+_INITIAL_CAPACITY: Final = 4096
+
+_POOL_LIMIT: Final = 4
+
+_BUF_POOL: Final[List[bytearray]] = []
+
+_POOL_LOCK: Final = threading.Lock()
+
+_BYTEORDERS = {"little": "<", "big": ">"}
+
+_ACCESS_ADVICE = {
+    None: None,
+    "sequential": getattr(mmap, "MADV_SEQUENTIAL", None),
+    "random": getattr(mmap, "MADV_RANDOM", None),
+}
+
+_INT_CODES = {1: "b", 2: "h", 4: "i", 8: "q"}
+
+_INT_STRUCTS = {
+    (size, signed, byteorder): struct.Struct(prefix + (code if signed else code.upper()))
+    for byteorder, prefix in _BYTEORDERS.items()
+    for size, code in _INT_CODES.items()
+    for signed in (True, False)
+}
+
+_FLOAT_STRUCTS = {
+    (double, byteorder): struct.Struct(prefix + ("d" if double else "f"))
+    for byteorder, prefix in _BYTEORDERS.items()
+    for double in (True, False)
+}
+
+
+def _acquire_buffer() -> bytearray:
+    """
+    Take a write buffer from the pool, or allocate a new one.
+
+    Pooled buffers keep the capacity they grew to, so a new `Builder` does
+    not have to grow its buffer again.
+    """
+    with _POOL_LOCK:
+        if _BUF_POOL:
+            return _BUF_POOL.pop()
+    return bytearray(_INITIAL_CAPACITY)
+
+
+def _release_buffer(buf: bytearray):
+    """
+    Return a write buffer to the pool, unless the pool is full.
+    """
+    with _POOL_LOCK:
+        if len(_BUF_POOL) < _POOL_LIMIT:
+            _BUF_POOL.append(buf)
+
+
+def _float_struct(byteorder: str, double: bool) -> struct.Struct:
+    """
+    Return the cached struct for a float of the given byteorder and width.
+    """
+    try:
+        return _FLOAT_STRUCTS[double, byteorder]
+    except KeyError:
+        raise ValueError("Invalid byteorder.") from None
 
 
 def float_from_bytes(
@@ -14,11 +91,7 @@ def float_from_bytes(
     """
     Convert bytes to a float.
     """
-    return struct.unpack(
-        ("<" if byteorder == 'little' else ">" if byteorder == 'big' else "") +
-        ("d" if double else "f"),
-        data
-    )[0]
+    return _float_struct(byteorder, double).unpack(data)[0]
 
 
 def float_to_bytes(
@@ -29,33 +102,190 @@ def float_to_bytes(
     """
     Convert a float to bytes.
     """
-    return struct.pack(
-        ("<" if byteorder == 'little' else ">" if byteorder == 'big' else "") +
-        ("d" if double else "f"),
-        value
-    )
+    return _float_struct(byteorder, double).pack(value)
+
+def _parse_field(arg: str) -> Tuple[str, int, Optional[str]]:
+    """
+    Parse a single field of a format string.
+
+    :param arg: The field, such as `i4`.
+
+    :return: The kind of the field, its size, and its struct code, or None
+        if the field has no fixed-size struct code.
+    """
+    kind = arg[0]
+    size = int(arg[1:]) if len(arg) > 1 else None
+    if kind == "b":
+        size = 1 if size is None else size
+        return kind, size, "%ds" % size
+    if kind in ("i", "u"):
+        size = 1 if size is None else size
+        code = _INT_CODES.get(size)
+        if code is not None and kind == "u":
+            code = code.upper()
+        return kind, size, code
+    if kind == "f" and size in (None, 4):
+        return kind, 4, "f"
+    if (kind == "f" and size == 8) or (kind == "d" and size in (None, 8)):
+        return kind, 8, "d"
+    if kind == "s":
+        return kind, 1 if size is None else size, None
+    raise ValueError("Invalid format string.")
+
+
+def _decode_strings(values: Tuple[Any, ...], strings: Tuple[int, ...]) -> Tuple[Any, ...]:
+    """
+    Decode the string fields of unpacked struct values as UTF-8.
+
+    :param strings: The indexes of the string fields.
+    """
+    items = list(values)
+    for i in strings:
+        items[i] = items[i].decode("utf-8")
+    return tuple(items)
+
+
+def _struct_op(s: struct.Struct, strings: Tuple[int, ...]) -> Callable[["Parser"], Tuple[Any, ...]]:
+    """
+    Build a read operation that unpacks a struct and decodes its string fields.
+
+    :param strings: The indexes of the fields to decode as UTF-8.
+    """
+    if not strings:
+        return lambda p: p._unpack(s)
+    return lambda p: _decode_strings(p._unpack(s), strings)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_fmt(fmt: str, endian: str) -> Tuple[Callable[["Parser"], Tuple[Any, ...]], ...]:
+    """
+    Compile a `Parser.read_fmt` format string into a sequence of read operations.
+
+    Runs of fields are merged into a single struct, so they are unpacked with
+    one call; strings are read as bytes and decoded afterwards. Only
+    integers of odd sizes break a run.
+    """
+    prefix = _BYTEORDERS.get(endian)
+    if prefix is None:
+        raise ValueError("Invalid byteorder.")
+    ops: List[Callable[["Parser"], Tuple[Any, ...]]] = []
+    codes: List[str] = []
+    strings: List[int] = []
+    for arg in fmt.split():
+        kind, size, code = _parse_field(arg)
+        if kind == "s":
+            strings.append(len(codes))
+            code = "%ds" % size
+        if code is not None:
+            codes.append(code)
+            continue
+        if codes:
+            ops.append(_struct_op(struct.Struct(prefix + "".join(codes)), tuple(strings)))
+            codes = []
+            strings = []
+        ops.append(lambda p, n=size, signed=kind == "i": (p.read_int(n, signed, endian),))
+    if codes:
+        ops.append(_struct_op(struct.Struct(prefix + "".join(codes)), tuple(strings)))
+    return tuple(ops)
+
+
+@functools.lru_cache(maxsize=256)
+def _record_struct(fmt: str, endian: str) -> Tuple[struct.Struct, Tuple[int, ...]]:
+    """
+    Compile a record format string into a single struct.
+
+    :return: The struct, and the indexes of its string fields.
+    """
+    prefix = _BYTEORDERS.get(endian)
+    if prefix is None:
+        raise ValueError("Invalid byteorder.")
+    codes: List[str] = []
+    strings: List[int] = []
+    for arg in fmt.split():
+        kind, size, code = _parse_field(arg)
+        if kind == "s":
+            strings.append(len(codes))
+            code = "%ds" % size
+        if code is None:
+            raise ValueError("Integer field %r must be 1, 2, 4 or 8 bytes." % arg)
+        codes.append(code)
+    if not codes:
+        raise ValueError("Empty format string.")
+    return struct.Struct(prefix + "".join(codes)), tuple(strings)
+
+
+def _seek_pos(offset: int, whence: int, pos: int, size: int) -> int:
+    """
+    Resolve the target of a `seek` on a memory-mapped file.
+
+    :param pos: The current position.
+    :param size: The position of the end of the file.
+    """
+    if whence == 0:
+        target = offset
+    elif whence == 1:
+        target = pos + offset
+    elif whence == 2:
+        target = size + offset
+    else:
+        raise ValueError("Invalid whence.")
+    if target < 0:
+        raise ValueError("Negative seek position.")
+    return target
+
+
+def _close_parser(file, mm: Optional[mmap.mmap], mv: Optional[memoryview]):
+    """
+    Release the mapping of a `Parser` and close its file.
+    """
+    if mm is not None:
+        mv.release()  # type: ignore
+        try:
+            mm.close()
+        except BufferError:
+            # Arrays from `Parser.read_np` or views from `Parser.view_all`
+            # still use the mapping; it is unmapped once they are gone.
+            pass
+    file.close()
+
 
 class Parser:
     """
     A class to parse binary files.
     """
 
-    def __init__(self, file_name):
+    __slots__ = ("file_name", "file", "file_size", "_mm", "_mv", "_pos", "_finalizer", "__weakref__")
+
+    def __init__(self, file_name, use_mmap: bool = True, access: Optional[str] = None):
         """
         Initialize the Parser object.
 
         :param file_name: The name of the file to open.
+        :param use_mmap: Whether to memory-map the file. Empty files are never mapped.
+        :param access: How the mapped file will be read, `"sequential"` or
+            `"random"`. It is passed to the kernel with `madvise` where
+            supported, to tune read-ahead.
         """
+        if access not in _ACCESS_ADVICE:
+            raise ValueError("Invalid access pattern.")
         self.file_name = file_name
-        self.file = open(file_name, "rb")
-        self.file_size = self.file.seek(0, 2)
-        self.file.seek(0)
-
-    def __del__(self):
-        """
-        Close the file.
-        """
-        self.close()
+        raw = open(file_name, "rb", buffering=0)
+        stat = os.fstat(raw.fileno())
+        self.file_size = stat.st_size
+        self._mm: Optional[mmap.mmap] = None
+        self._mv: Optional[memoryview] = None
+        self._pos = 0
+        if use_mmap and self.file_size:
+            # The mapping does all the reading, so no buffer is put on top of it.
+            self.file: Union[io.FileIO, io.BufferedReader] = raw
+            self._mm = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mv = memoryview(self._mm)
+            advice = _ACCESS_ADVICE[access]
+            if advice is not None:
+                self._mm.madvise(advice)
+        else:
+            self.file = io.BufferedReader(raw, max(getattr(stat, "st_blksize", 0), _READ_CHUNK))
+        self._finalizer = weakref.finalize(self, _close_parser, self.file, self._mm, self._mv)
 
     def __enter__(self):
         """
@@ -72,49 +302,98 @@ class Parser:
     def read(self, size: Optional[int] = 1) -> bytes:
         """
         Read a certain amount of bytes from the file.
+
+        A size of None or below zero reads the rest of the file, as `read_all`.
         """
-        return self.file.read(size)
+        if size is None or size < 0:
+            return self.read_all()
+        mm = self._mm
+        if mm is None:
+            return self.file.read(size)
+        pos = self._pos
+        data = mm[pos:pos + size]
+        self._pos = pos + len(data)
+        return data
 
     def read_all(self) -> bytes:
         """
-        Read all the data from the file. This is equivalent to calling `read(None)`.
+        Read all the remaining data from the file.
         """
-        return self.read(None)
+        mm = self._mm
+        if mm is None:
+            return self.file.read()
+        pos = self._pos
+        data = mm[pos:]
+        self._pos = pos + len(data)
+        return data
+
+    def view_all(self) -> memoryview:
+        """
+        Return all the remaining data from the file as a read-only memoryview.
+
+        If the file is memory-mapped the view shares memory with the mapping
+        instead of copying it, and the mapping outlives `close` until the
+        view is released.
+        """
+        mv = self._mv
+        if mv is None:
+            return memoryview(self.read_all())
+        pos = self._pos
+        view = mv[pos:]
+        self._pos = pos + len(view)
+        return view
 
     def read_int(self, size: int = 1, signed: bool = False, endian: str = "little") -> int:
         """
         Read an integer from the file.
 
-        :param size: The size of the integer.
+        :param size: The size of the integer. A size below zero reads the
+            rest of the file as one integer.
         :param signed: Whether the integer is signed.
         :param endian: The byteorder of the integer.
 
         :return: The integer.
+
+        :raises EOFError: If fewer than `size` bytes are left. The position
+            is not moved.
         """
-        if endian not in ["little", "big"]:
-            raise ValueError("Invalid byteorder.")
-        return int.from_bytes(self.read(size), byteorder=endian, signed=signed)  # type: ignore
+        s = _INT_STRUCTS.get((size, signed, endian))
+        if s is None:
+            if endian not in _BYTEORDERS:
+                raise ValueError("Invalid byteorder.")
+            data = self._read_view(size)
+            if len(data) < size:
+                self.seek(-len(data), 1)
+                raise EOFError("Unexpected end of file.")
+            return int.from_bytes(data, byteorder=endian, signed=signed)  # type: ignore
+        return self._unpack(s)[0]
 
     def read_float(self, double: bool = True, endian: str = "little") -> float:
         """
         Read a float from the file.
 
+        :param double: Whether the float is double precision (8 bytes).
         :param endian: The byteorder of the float.
 
         :return: The float.
+
+        :raises EOFError: If fewer than 4 (or 8) bytes are left. The position
+            is not moved.
         """
-        return float_from_bytes(self.read(4), endian, double=double)  # type: ignore
+        return self._unpack(_float_struct(endian, double))[0]
 
-    def read_str(self, size: int = 1, encoding: str = "utf-8") -> str:
+    def read_str(self, size: int = 1, encoding: str = "utf-8", ascii: bool = False) -> str:
         """
         Read a string from the file.
 
         :param size: The size of the string.
         :param encoding: The encoding of the string.
+        :param ascii: Whether the string is known to be ASCII, such as a magic
+            number. It is then decoded as latin-1, which skips validation.
 
         :return: The string.
         """
-        return self.read(size).decode(encoding)
+        return str(self._read_view(size), "latin-1" if ascii else encoding)
 
     def read_until(self, data: bytes) -> bytes:
         """
@@ -122,12 +401,29 @@ class Parser:
 
         :param data: The data to read until.
 
-        :return: The data read.
-        """
-        src = self.read(len(data))
-        while data not in src:
-            src += self.read(1)
-        return src
+        :return: The data read, including `data`. If `data` is not found,
+            the rest of the file is returned.
+        """
+        mm = self._mm
+        if mm is not None:
+            pos = self._pos
+            idx = mm.find(data, pos)
+            return self.read(idx + len(data) - pos if idx != -1 else None)
+        start = self.file.tell()
+        buf = bytearray()
+        offset = 0
+        while True:
+            chunk = self.file.read(_READ_CHUNK)
+            if not chunk:
+                return bytes(buf)
+            buf += chunk
+            idx = buf.find(data, offset)
+            if idx != -1:
+                end = idx + len(data)
+                del buf[end:]
+                self.file.seek(start + end)
+                return bytes(buf)
+            offset = max(0, len(buf) - len(data) + 1)
 
     def read_fmt(self, fmt: str, endian: str = "little") -> Tuple[Any, ...]:
         """
@@ -141,31 +437,157 @@ class Parser:
         * `b`: A single byte. Append a number to specify the size.
         * `i`: A signed integer. Append a number to specify the size.
         * `u`: An unsigned integer. Append a number to specify the size.
-        * `f`: A float. Append a number to specify the size.
+        * `f`: A float. Append `4` or `8` to specify the size.
+        * `d`: A double precision float.
         * `s`: A string. Append a number to specify the size.
 
         - use spaces to separate the arguments.
 
         Example: `head, ver = read_fmt("b4 i4")`
+
+        Every field must be read in full, `b` and `s` included: unlike `read`
+        and `read_str`, which return what is left, a field that runs past the
+        end of the file raises `EOFError`.
         """
+        ops = _compile_fmt(fmt, endian)
+        if len(ops) == 1:
+            return ops[0](self)
         data: List[Any] = []
-        for arg in fmt.split():
-            if arg[0] == "b":
-                data.append(self.read(int(arg[1:]) if len(arg) > 1 else 1))
-            elif arg[0] == "i":
-                data.append(self.read_int(int(arg[1:]) if len(arg) > 1 else 1, signed=True, endian=endian))
-            elif arg[0] == "u":
-                data.append(self.read_int(int(arg[1:]) if len(arg) > 1 else 1, signed=False, endian=endian))
-            elif arg[0] == "f":
-                data.append(self.read_float(False, endian))
-            elif arg[0] == "d":
-                data.append(self.read_float(True, endian))
-            elif arg[0] == "s":
-                data.append(self.read_str(int(arg[1:]) if len(arg) > 1 else 1))
-            else:
-                raise ValueError("Invalid format string.")
+        extend = data.extend
+        for op in ops:
+            extend(op(self))
         return tuple(data)
 
+    def read_array(self, fmt: str, count: int, endian: str = "little") -> List[Tuple[Any, ...]]:
+        """
+        Read an array of records from the file.
+
+        :param fmt: The format string of a record, as in `read_fmt`. Integer
+            fields must be 1, 2, 4 or 8 bytes.
+        :param count: The number of records.
+        :param endian: The byteorder of the records.
+
+        :return: The records.
+
+        :raises EOFError: If fewer than `count` records are left. The
+            position is not moved.
+
+        Example: `points = read_array("f f f", 100)`
+        """
+        if count < 0:
+            raise ValueError("Negative record count.")
+        s, strings = _record_struct(fmt, endian)
+        size = s.size * count
+        data = self._read_view(size)
+        if len(data) < size:
+            self.seek(-len(data), 1)
+            raise EOFError("Unexpected end of file.")
+        if strings:
+            return [_decode_strings(values, strings) for values in s.iter_unpack(data)]
+        return list(s.iter_unpack(data))
+
+    def read_np(self, dtype: Any, count: int = -1, endian: str = "little") -> "numpy.ndarray":
+        """
+        Read an array of numbers from the file into a NumPy array.
+
+        If the file is memory-mapped the array shares memory with the mapping
+        instead of copying it, and the mapping outlives `close` until the
+        array is garbage collected. Requires NumPy.
+
+        :param dtype: The NumPy data type of the items, such as `"u4"`.
+        :param count: The number of items. -1 reads as many whole items as
+            are left in the file.
+        :param endian: The byteorder of the items.
+
+        :return: The read-only array.
+
+        :raises EOFError: If fewer than `count` items are left. The position
+            is not moved.
+        """
+        import numpy as np
+
+        prefix = _BYTEORDERS.get(endian)
+        if prefix is None:
+            raise ValueError("Invalid byteorder.")
+        dt = np.dtype(dtype).newbyteorder(prefix)
+        if self._mm is None:
+            if count < 0:
+                data = self.file.read()
+                count, extra = divmod(len(data), dt.itemsize)
+                if extra:
+                    self.file.seek(-extra, 1)
+            else:
+                data = self.file.read(dt.itemsize * count)
+                if len(data) < dt.itemsize * count:
+                    self.file.seek(-len(data), 1)
+                    raise EOFError("Unexpected end of file.")
+            return np.frombuffer(data, dtype=dt, count=count)
+        pos = min(self._pos, self.file_size)
+        left = self.file_size - pos
+        if count < 0:
+            count = left // dt.itemsize
+        elif dt.itemsize * count > left:
+            raise EOFError("Unexpected end of file.")
+        arr = np.frombuffer(self._mm, dtype=dt, count=count, offset=pos)
+        self._pos = pos + arr.nbytes
+        return arr
+
+    def prefetch(self, offset: int, length: int):
+        """
+        Hint that a region of the mapped file will be read soon.
+
+        This asks the kernel to start reading it in ahead of time, for
+        example for records located through an index. It does nothing if the
+        file is not mapped or the platform has no `madvise`.
+
+        :param offset: The start of the region.
+        :param length: The length of the region.
+        """
+        if self.file.closed:
+            raise ValueError("I/O operation on closed file.")
+        if self._mm is None or not hasattr(mmap, "MADV_WILLNEED") or offset >= self.file_size:
+            return
+        start = offset - offset % mmap.PAGESIZE
+        self._mm.madvise(mmap.MADV_WILLNEED, start, length + offset - start)
+
+    def _read_view(self, size: int) -> Union[bytes, memoryview]:
+        """
+        Read a certain amount of bytes without copying them out of the mapping.
+        A size below zero reads the rest of the file, as `read`.
+
+        The returned view must not outlive the read, or `close` cannot unmap
+        the file.
+        """
+        mv = self._mv
+        if mv is None:
+            return self.file.read(-1 if size < 0 else size)
+        pos = self._pos
+        view = mv[pos:] if size < 0 else mv[pos:pos + size]
+        self._pos = pos + len(view)
+        return view
+
+    def _unpack(self, s: struct.Struct) -> Tuple[Any, ...]:
+        """
+        Unpack a struct at the current position and advance past it.
+
+        :raises EOFError: If the struct runs past the end of the file. The
+            position is not moved.
+        """
+        mm = self._mm
+        if mm is None:
+            data = self.file.read(s.size)
+            if len(data) < s.size:
+                self.file.seek(-len(data), 1)
+                raise EOFError("Unexpected end of file.")
+            return s.unpack(data)
+        pos = self._pos
+        try:
+            values = s.unpack_from(mm, pos)
+        except struct.error:
+            raise EOFError("Unexpected end of file.") from None
+        self._pos = pos + s.size
+        return values
+
     def seek(self, offset: int, whence: int = 0):
         """
         Seek to a certain position in the file.
@@ -173,19 +595,29 @@ class Parser:
         :param offset: The offset to seek to.
         :param whence: The position to seek from.
         """
-        return self.file.seek(offset, whence)
+        if self._mm is None:
+            return self.file.seek(offset, whence)
+        self._pos = _seek_pos(offset, whence, self._pos, self.file_size)
+        return self._pos
 
     def tell(self):
         """
         Return the current position in the file.
         """
-        return self.file.tell()
+        if self._mm is None:
+            return self.file.tell()
+        return self._pos
 
     def close(self):
         """
         Close the file.
+
+        The Parser stops using its mapping even if a `read_np` array or a
+        `view_all` view keeps it alive, so later reads raise `ValueError`
+        like reads from any closed file.
         """
-        self.file.close()
+        self._finalizer()
+        self._mm = self._mv = None
 
 
 class Builder:
@@ -193,20 +625,42 @@ class Builder:
     A class to build binary files.
     """
 
-    def __init__(self, file_name):
+    __slots__ = ("file_name", "file", "_mm", "_buf", "_off", "_end", "_mark", "__weakref__")
+
+    def __init__(self, file_name, size: Optional[int] = None):
         """
         Initialize the Builder object.
 
         :param file_name: The name of the file to build.
+        :param size: The expected size of the file. If given, the file is
+            memory-mapped and written in place, which also makes seeking back
+            to patch headers cheap. The mapping grows if more is written, and
+            the file is truncated to the written size on `close`.
         """
         self.file_name = file_name
-        self.file = open(file_name, "wb")
+        self._mm: Optional[mmap.mmap] = None
+        self._off = 0
+        self._end = 0
+        self._mark = 0
+        if size:
+            self.file = open(file_name, "w+b", buffering=0)
+            try:
+                self.file.truncate(size)
+                self._mm = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_WRITE)
+            except BaseException:
+                self.file.close()
+                raise
+            self._buf: Union[bytearray, mmap.mmap] = self._mm
+        else:
+            self.file = open(file_name, "wb")
+            self._buf = _acquire_buffer()
 
     def __del__(self):
         """
-        Close the file.
+        Flush and close the file.
         """
-        self.close()
+        if hasattr(self, "file"):
+            self.close()
 
     def __enter__(self):
         """
@@ -223,10 +677,80 @@ class Builder:
     def write(self, data: Union[bytes, bytearray]) -> "Builder":
         """
         Write data to the file.
+
+        Unless the file is memory-mapped, data is buffered in memory and
+        written out once the buffer grows past `_FLUSH_THRESHOLD` bytes, or on
+        `flush`, `seek` and `close`.
+        """
+        if not isinstance(data, (bytes, bytearray)):
+            # len() of other buffers, such as array.array, counts items.
+            view = memoryview(data)
+            data = view.cast("B") if view.nbytes else b""
+        size = len(data)
+        if size >= _FLUSH_THRESHOLD and self._mm is None:
+            self._write_buf()
+            self.file.write(data)
+            return self
+        off = self._reserve(size)
+        self._buf[off:off + size] = data
+        self._off = off + size
+        return self
+
+    def flush(self) -> "Builder":
         """
-        self.file.write(data)
+        Write the buffered data to the file and flush it to the OS.
+        """
+        if self._mm is not None:
+            self._mm.flush()
+        else:
+            self._write_buf()
+            self.file.flush()
         return self
 
+    def _write_buf(self):
+        """
+        Move the buffered data into the file object.
+        """
+        if self._off:
+            with memoryview(self._buf) as view:
+                self.file.write(view[:self._off])
+            self._off = 0
+
+    def _reserve(self, size: int) -> int:
+        """
+        Make room for `size` more bytes in the buffer.
+
+        The buffer doubles as needed, and is flushed instead of growing past
+        `_FLUSH_THRESHOLD`. A mapping doubles without limit.
+
+        :return: The offset to write the bytes at.
+        """
+        end = self._off + size
+        if end > len(self._buf):
+            if self.file.closed:
+                raise ValueError("I/O operation on closed file.")
+            if self._mm is not None:
+                self._grow_map(max(end, 2 * len(self._mm)))
+            elif end > _FLUSH_THRESHOLD:
+                self._write_buf()
+                end = size
+            while end > len(self._buf):
+                self._buf *= 2
+        return self._off
+
+    def _grow_map(self, size: int):
+        """
+        Grow the file and its mapping to `size` bytes.
+        """
+        try:
+            self._mm.resize(size)  # type: ignore
+        except SystemError:
+            # No mremap (macOS, BSD): extend the file and map it again.
+            self._mm.flush()  # type: ignore
+            self._mm.close()  # type: ignore
+            self.file.truncate(size)
+            self._mm = self._buf = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_WRITE)
+
     def write_int(self, data: int, size: int = 1, signed: bool = False, endian: str = "little") -> "Builder":
         """
         Write an integer to the file.
@@ -235,22 +759,59 @@ class Builder:
         :param size: The size of the integer.
         :param signed: Whether the integer is signed.
         :param endian: The byteorder of the integer.
-        """
-        if endian not in ["little", "big"]:
-            raise ValueError("Invalid byteorder.")
-        self.write(data.to_bytes(size, byteorder=endian, signed=signed))  # type: ignore
-        return self
 
-    def write_float(self, data: float, endian: str = "little") -> "Builder":
+        :raises TypeError: If `data` is not an integer.
+        :raises OverflowError: If the integer does not fit in `size` bytes.
+        """
+        s = _INT_STRUCTS.get((size, signed, endian))
+        if s is None:
+            if endian not in _BYTEORDERS:
+                raise ValueError("Invalid byteorder.")
+            value = operator.index(data)
+            return self.write(value.to_bytes(size, byteorder=endian, signed=signed))  # type: ignore
+        try:
+            return self._pack(s, data)
+        except struct.error as e:
+            if not hasattr(type(data), "__index__"):
+                raise TypeError("'%s' object cannot be interpreted as an integer" % type(data).__name__) from None
+            # Match the OverflowError that int.to_bytes raises for odd sizes.
+            raise OverflowError(str(e)) from None
+
+    def write_float(self, data: float, endian: str = "little", double: bool = False) -> "Builder":
         """
         Write a float to the file.
 
         :param data: The float.
         :param endian: The byteorder of the float.
+        :param double: Whether to write a double precision (8 bytes) float.
+        """
+        return self._pack(_float_struct(endian, double), data)
+
+    def _pack(self, s: struct.Struct, *values: Any) -> "Builder":
+        """
+        Pack a struct directly into the buffer.
         """
-        self.write(float_to_bytes(data, endian))  # type: ignore
+        off = self._reserve(s.size)
+        s.pack_into(self._buf, off, *values)
+        self._off = off + s.size
         return self
 
+    def write_np(self, data: "numpy.ndarray", endian: str = "little") -> "Builder":
+        """
+        Write the items of a NumPy array to the file.
+
+        :param data: The array.
+        :param endian: The byteorder to write the items in.
+        """
+        import numpy as np
+
+        prefix = _BYTEORDERS.get(endian)
+        if prefix is None:
+            raise ValueError("Invalid byteorder.")
+        arr = np.asarray(data)
+        arr = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder(prefix)).reshape(-1)
+        return self.write(memoryview(arr).cast("B"))  # type: ignore
+
     def write_str(self, data: str, encoding: str = "utf-8") -> "Builder":
         """
         Write a string to the file.
@@ -268,16 +829,50 @@ class Builder:
         :param offset: The offset to seek to.
         :param whence: The position to seek from.
         """
-        return self.file.seek(offset, whence)
+        if self._mm is None:
+            self._write_buf()
+            return self.file.seek(offset, whence)
+        if self.file.closed:
+            raise ValueError("I/O operation on closed file.")
+        self._end = self._written_end()
+        self._off = self._mark = _seek_pos(offset, whence, self._off, self._end)
+        return self._off
+
+    def _written_end(self) -> int:
+        """
+        Return the end of the data written to the mapping.
+
+        Seeking past the end does not extend the file until something is
+        written there, so `_off` only counts once it has moved since the last
+        seek landed at `_mark`.
+        """
+        if self._off == self._mark:
+            return self._end
+        return max(self._end, self._off)
 
     def tell(self):
         """
         Return the current position in the file.
         """
-        return self.file.tell()
+        if self._mm is None:
+            return self.file.tell() + self._off
+        if self.file.closed:
+            raise ValueError("I/O operation on closed file.")
+        return self._off
 
     def close(self):
         """
         Close the file.
         """
+        if not self.file.closed:
+            if self._mm is None:
+                self._write_buf()
+                _release_buffer(self._buf)  # type: ignore
+                # An empty buffer sends every later write to the closed check
+                # in _reserve.
+                self._buf = bytearray()
+            else:
+                self._mm.flush()
+                self._mm.close()
+                self.file.truncate(self._written_end())
         self.file.close()
\ No newline at end of file